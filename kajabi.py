@@ -1,11 +1,16 @@
 import os
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import threading
 import signal
 import configparser
 import csv
+import multiprocessing
+from multiprocessing.util import Finalize
 from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 from queue import Queue, Empty
 from dotenv import load_dotenv
 from selenium import webdriver
@@ -16,7 +21,7 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from webdriver_manager.chrome import ChromeDriverManager
 from tqdm import tqdm
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException
 import traceback
 from datetime import datetime
 
@@ -26,10 +31,91 @@ config.read('config.ini')
 MAX_RETRIES = config.getint('Download', 'max_retries', fallback=3)
 TIMEOUT = config.getint('Download', 'timeout', fallback=60)
 BASE_DIR = config.get('Paths', 'base_dir', fallback='Kajabi_Courses')
-MAX_LESSON_THREADS = config.getint('Threads', 'max_lesson_threads', fallback=3)
-
-# Thread-safe logging lock
-log_lock = threading.Lock()
+# max_drivers replaces max_lesson_threads; older configs keep their setting
+MAX_DRIVERS = config.getint('Threads', 'max_drivers', fallback=config.getint('Threads', 'max_lesson_threads', fallback=3))
+MAX_DOWNLOAD_THREADS = config.getint('Threads', 'max_download_threads', fallback=16)
+LESSON_BATCH_SIZE = 5
+HEADLESS = config.getboolean('Browser', 'headless', fallback=True)
+
+# Page locators, built once. Lesson page selectors can be overridden in [Selectors].
+SEL_BODY = (By.TAG_NAME, "body")
+SEL_USERNAME = (By.ID, "username")
+SEL_PASSWORD = (By.ID, "password")
+SEL_SUBMIT = (By.XPATH, "//button[@type='submit']")
+SEL_COURSE_CARD = (By.CSS_SELECTOR, "li.sage-catalog-item")
+SEL_COURSE_TITLE = (By.CSS_SELECTOR, "span.t-sage--truncate")
+SEL_COURSE_LINK = (By.CSS_SELECTOR, "a.sage-link")
+SEL_EXPAND_ALL = (By.XPATH, '//button[.//span[contains(text(), "Expand All")]]')
+SEL_OUTLINE_ITEM = (By.CSS_SELECTOR, 'section.kjb-outlinelist-item')
+SEL_OUTLINE_LESSON = (By.CSS_SELECTOR, 'section.kjb-outlinelist-item--depth-1')
+SEL_OUTLINE_TITLE = (By.CSS_SELECTOR, 'span.sage-btn__truncate-text')
+SEL_LESSON_LINK = (By.CSS_SELECTOR, 'a[href*="/admin/posts/"]')
+SEL_DESCRIPTION = (By.CSS_SELECTOR, config.get('Selectors', 'description', fallback='div.kjb-rte'))
+SEL_IFRAME = (By.CSS_SELECTOR, config.get('Selectors', 'iframe', fallback='iframe'))
+SEL_IFRAME_BODY = (By.CSS_SELECTOR, config.get('Selectors', 'iframe_body', fallback='body#tinymce'))
+SEL_THUMBNAIL = (By.CSS_SELECTOR, config.get('Selectors', 'thumbnail', fallback='img.img-thumbnail'))
+SEL_VIDEO_NONE = (By.XPATH, config.get('Selectors', 'video_none', fallback='//button[.//em[text()="None"] and contains(@class, "sage-choice--active")]'))
+SEL_VIDEO_BUTTON = (By.XPATH, config.get('Selectors', 'video_button', fallback='//button[contains(., "Video Actions") or contains(., "video actions")]'))
+SEL_VIDEO_LINK = (By.XPATH, config.get('Selectors', 'video_link', fallback='//a[contains(@href, ".mp4") and contains(@class, "sage-dropdown__item-control--icon-download")]'))
+SEL_MATERIAL_SECTION = (By.CSS_SELECTOR, config.get('Selectors', 'material_section', fallback='section.sage-sortable__item--card'))
+SEL_MATERIAL_TITLE = (By.CSS_SELECTOR, config.get('Selectors', 'material_title', fallback='h1.sage-sortable__item-title'))
+SEL_MATERIAL_LINK = (By.CSS_SELECTOR, config.get('Selectors', 'material_link', fallback='a.sage-btn--icon-only-download'))
+
+LESSON_PAGE_SELECTORS = {
+    "description": SEL_DESCRIPTION[1],
+    "iframe": SEL_IFRAME[1],
+    "iframeBody": SEL_IFRAME_BODY[1],
+    "thumbnail": SEL_THUMBNAIL[1],
+    "videoNone": SEL_VIDEO_NONE[1],
+    "materialSection": SEL_MATERIAL_SECTION[1],
+    "materialTitle": SEL_MATERIAL_TITLE[1],
+    "materialLink": SEL_MATERIAL_LINK[1],
+}
+
+# Collects description, thumbnail, video "None" state and materials in one call.
+# Returns null until the lesson content has rendered, unless forced.
+LESSON_PAGE_SCRIPT = """
+const sel = arguments[0];
+const force = arguments[1];
+const text = (el) => (el && el.innerText ? el.innerText.trim() : "");
+let description = text(document.querySelector(sel.description));
+if (!description) {
+    const frame = document.querySelector(sel.iframe);
+    try {
+        const doc = frame && frame.contentDocument;
+        description = text(doc && doc.querySelector(sel.iframeBody));
+    } catch (e) {}
+}
+const thumb = document.querySelector(sel.thumbnail);
+const materials = Array.from(document.querySelectorAll(sel.materialSection)).map((section) => {
+    const link = section.querySelector(sel.materialLink);
+    return {name: text(section.querySelector(sel.materialTitle)), url: link ? link.href : null};
+});
+if (!force && !description && !thumb && !materials.length) {
+    return null;
+}
+const videoNone = document.evaluate(sel.videoNone, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue !== null;
+return {description: description, thumbnail: thumb ? thumb.src : null, videoNone: videoNone, materials: materials};
+"""
+
+# Shared HTTP session: pooled keep-alive connections and retry policy for all file downloads
+SESSION = requests.Session()
+SESSION.headers.update({'User-Agent': 'Mozilla/5.0'})
+DOWNLOAD_RETRY = Retry(total=MAX_RETRIES, backoff_factor=1, status_forcelist=(429, 500, 502, 503, 504),
+                       allowed_methods=('GET',), respect_retry_after_header=True)
+DOWNLOAD_ADAPTER = HTTPAdapter(pool_connections=16, pool_maxsize=max(64, MAX_DOWNLOAD_THREADS + 1), max_retries=DOWNLOAD_RETRY)
+SESSION.mount('https://', DOWNLOAD_ADAPTER)
+SESSION.mount('http://', DOWNLOAD_ADAPTER)
+
+# Large chunks and write buffer keep write() syscalls and tqdm updates low on big videos
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Shared worker pool for thumbnail/material downloads across all lessons
+DOWNLOAD_POOL = ThreadPoolExecutor(max_workers=MAX_DOWNLOAD_THREADS)
+
+# Thread-safe logging lock (re-entrant so log_status can compact while holding it)
+log_lock = threading.RLock()
 
 # Global state
 FAILED_DOWNLOADS = []
@@ -37,6 +123,12 @@ PAUSED = False
 INTERRUPTED = False
 DRIVER = None
 
+# Per-process state for lesson workers (see init_worker)
+IS_WORKER = False
+WORKER_DRIVER = None
+WORKER_LOG_ROWS = []
+PREFETCHED_TAB = None
+
 def signal_handler(signum, frame):
     global PAUSED, INTERRUPTED
     if PAUSED:
@@ -54,162 +146,187 @@ PASSWORD = os.getenv('KAJABI_PASSWORD')
 KAJABI_URL = os.getenv('KAJABI_URL')
 
 log_file = "download_log.csv"
+LOG_HEADERS = ["Timestamp", "Course", "Module", "Lesson", "Description", "Thumbnail", "Video", "Material"]
+LOG_FLUSH_EVERY = 10
+LOG_COMPACT_EVERY = 500
+
+# In-memory copy of download_log.csv keyed by (course, module, lesson).
+# Updates are appended to the CSV as journal rows, so the file may hold several
+# rows per lesson until compact_log() rewrites it; the last row always wins.
+LOG_INDEX = {}
+# Keys of LOG_INDEX rows whose components are all Success/None, kept in step with it
+COMPLETED_LESSONS = set()
+LOG_HANDLE = None
+LOG_WRITER = None
+LOG_UPDATES = 0
 
 def init_csv():
     if not os.path.exists(log_file):
         with open(log_file, "w", newline='', encoding="utf-8") as f:
             writer = csv.writer(f)
-            writer.writerow(["Timestamp", "Course", "Module", "Lesson", "Description", "Thumbnail", "Video", "Material"])
+            writer.writerow(LOG_HEADERS)
 
-def get_lesson_status(course_title, module_title, lesson_title):
+def index_log_row(row):
+    key = (row['Course'], row['Module'], row['Lesson'])
+    LOG_INDEX[key] = row
+    if all(row.get(field, "Failed") in ["Success", "None"] for field in ("Description", "Thumbnail", "Video", "Material")):
+        COMPLETED_LESSONS.add(key)
+    else:
+        COMPLETED_LESSONS.discard(key)
+
+def load_log_index():
     init_csv()
+    LOG_INDEX.clear()
+    COMPLETED_LESSONS.clear()
     try:
         with open(log_file, "r", newline='', encoding="utf-8") as f:
             reader = csv.DictReader(f)
             for row in reader:
-                if (row['Course'] == course_title and 
-                    row['Module'] == module_title and 
-                    row['Lesson'] == lesson_title):
-                    return (row.get('Description', 'Failed'),
-                            row.get('Thumbnail', 'Failed'),
-                            row.get('Video', 'Failed'),
-                            row.get('Material', 'Failed'))
+                # Later journal rows supersede earlier ones for the same lesson
+                index_log_row(row)
     except Exception as e:
         print(f"⚠️ Error reading CSV: {e}")
-    return ('Failed', 'Failed', 'Failed', 'Failed')
-
-def log_status(course_title, module_title, safe_lesson_base, status_dict):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    headers = ["Timestamp", "Course", "Module", "Lesson", "Description", "Thumbnail", "Video", "Material"]
-    rows = []
-    updated = False
-
-    try:
-        with open(log_file, "r", newline='', encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if (row['Course'] == course_title and 
-                    row['Module'] == module_title and 
-                    row['Lesson'] == safe_lesson_base):
-                    row.update({
-                        'Timestamp': timestamp,
-                        'Description': status_dict.get("Description", "Failed"),
-                        'Thumbnail': status_dict.get("Thumbnail", "Failed"),
-                        'Video': status_dict.get("Video", "Failed"),
-                        'Material': status_dict.get("Material", "Failed")
-                    })
-                    updated = True
-                rows.append(row)
-    except FileNotFoundError:
-        init_csv()
-
-    if not updated:
-        rows.append({
-            'Timestamp': timestamp,
-            'Course': course_title,
-            'Module': module_title,
-            'Lesson': safe_lesson_base,
-            'Description': status_dict.get("Description", "Failed"),
-            'Thumbnail': status_dict.get("Thumbnail", "Failed"),
-            'Video': status_dict.get("Video", "Failed"),
-            'Material': status_dict.get("Material", "Failed")
-        })
 
+def compact_log():
+    global LOG_HANDLE, LOG_WRITER, LOG_UPDATES
     with log_lock:
+        if LOG_HANDLE is not None:
+            LOG_HANDLE.close()
+            LOG_HANDLE = None
+            LOG_WRITER = None
         with open(log_file, "w", newline='', encoding="utf-8") as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
+            writer = csv.DictWriter(f, fieldnames=LOG_HEADERS)
             writer.writeheader()
-            writer.writerows(rows)
+            writer.writerows(LOG_INDEX.values())
+        LOG_UPDATES = 0
+
+def get_lesson_status(course_title, module_title, lesson_title):
+    row = LOG_INDEX.get((course_title, module_title, lesson_title))
+    if row is None:
+        return ('Failed', 'Failed', 'Failed', 'Failed')
+    return (row.get('Description', 'Failed'),
+            row.get('Thumbnail', 'Failed'),
+            row.get('Video', 'Failed'),
+            row.get('Material', 'Failed'))
+
+def record_log_row(row):
+    global LOG_HANDLE, LOG_WRITER, LOG_UPDATES
+    with log_lock:
+        index_log_row(row)
+        if LOG_HANDLE is None:
+            init_csv()
+            LOG_HANDLE = open(log_file, "a", newline='', encoding="utf-8", buffering=64 * 1024)
+            LOG_WRITER = csv.DictWriter(LOG_HANDLE, fieldnames=LOG_HEADERS)
+        LOG_WRITER.writerow(row)
+        LOG_UPDATES += 1
+        if LOG_UPDATES >= LOG_COMPACT_EVERY:
+            compact_log()
+        elif LOG_UPDATES % LOG_FLUSH_EVERY == 0:
+            LOG_HANDLE.flush()
+
+def log_status(course_title, module_title, safe_lesson_base, status_dict):
+    row = {
+        'Timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'Course': course_title,
+        'Module': module_title,
+        'Lesson': safe_lesson_base,
+        'Description': status_dict.get("Description", "Failed"),
+        'Thumbnail': status_dict.get("Thumbnail", "Failed"),
+        'Video': status_dict.get("Video", "Failed"),
+        'Material': status_dict.get("Material", "Failed")
+    }
+
+    if IS_WORKER:
+        # Only the parent process owns download_log.csv; workers hand rows back with their results
+        index_log_row(row)
+        WORKER_LOG_ROWS.append(row)
+    else:
+        record_log_row(row)
 
 def get_completed_lessons():
-    init_csv()
-    completed = set()
+    with log_lock:
+        return set(COMPLETED_LESSONS)
+
+class SafeCharTable(dict):
+    """str.translate table mapping anything but alphanumerics and `allowed` to '_', filled in per code point on first use."""
+    def __init__(self, allowed):
+        super().__init__()
+        self.allowed = allowed
+
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        replacement = char if char.isalnum() or char in self.allowed else "_"
+        self[codepoint] = replacement
+        return replacement
+
+SAFE_NAME_TABLE = SafeCharTable(" _-–")
+SAFE_FILE_TABLE = SafeCharTable(" ._-–")
+
+def sanitize(name, limit=200, table=SAFE_NAME_TABLE):
+    return name.translate(table)[:limit]
+
+def stat_or_none(path):
     try:
-        with open(log_file, "r", newline='', encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                if (row.get("Description", "Failed") in ["Success", "None"] and 
-                    row.get("Thumbnail", "Failed") in ["Success", "None"] and
-                    row.get("Video", "Failed") in ["Success", "None"] and
-                    row.get("Material", "Failed") in ["Success", "None"]):
-                    key = f"{row['Course']}|{row['Module']}|{row['Lesson']}"
-                    completed.add(key)
-    except Exception as e:
-        print(f"⚠️ Error reading completed lessons: {e}")
-    return completed
+        return os.stat(path)
+    except FileNotFoundError:
+        return None
+
+def remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
 
-def get_unique_filename(base_path, filename):
+def get_unique_filename(base_path, filename, claimed=None):
     counter = 1
     new_path = os.path.join(base_path, filename)
-    while os.path.exists(new_path):
+    while (claimed and new_path in claimed) or os.path.lexists(new_path):
         name, ext = os.path.splitext(filename)
         new_path = os.path.join(base_path, f"{name}_{counter}{ext}")
         counter += 1
     return new_path
 
+def sync_session_cookies(driver):
+    for cookie in driver.get_cookies():
+        SESSION.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+
 def selenium_download_video(driver, lesson_url, video_path, video_filename, course_title, module_title, lesson_title):
     for attempt in range(MAX_RETRIES):
         try:
             print(f"    ℹ️ Attempt {attempt + 1}/{MAX_RETRIES} to download video: {video_filename}")
             driver.get(lesson_url)
-            WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+            WebDriverWait(driver, 30).until(EC.presence_of_element_located(SEL_BODY))
             
             # Check if on login page
             if "login" in driver.current_url:
                 print("    ⚠️ Session expired, re-logging in...")
                 driver.get(f"{KAJABI_URL}/login")
-                WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.ID, "username"))).send_keys(EMAIL)
-                driver.find_element(By.ID, "password").send_keys(PASSWORD)
-                driver.find_element(By.XPATH, "//button[@type='submit']").click()
-                time.sleep(5)
+                WebDriverWait(driver, 30).until(EC.presence_of_element_located(SEL_USERNAME)).send_keys(EMAIL)
+                driver.find_element(*SEL_PASSWORD).send_keys(PASSWORD)
+                driver.find_element(*SEL_SUBMIT).click()
+                WebDriverWait(driver, 30).until(lambda d: "login" not in d.current_url)
+                sync_session_cookies(driver)
                 driver.get(lesson_url)
-                WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-
-            # Updated selector - more flexible
-            video_btn = WebDriverWait(driver, 30).until(
-                EC.element_to_be_clickable((By.XPATH, '//button[contains(., "Video Actions") or contains(., "video actions")]'))
-            )
-            driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", video_btn)
-            time.sleep(1)
+                WebDriverWait(driver, 30).until(EC.presence_of_element_located(SEL_BODY))
+
+            video_btn = WebDriverWait(driver, 30).until(EC.element_to_be_clickable(SEL_VIDEO_BUTTON))
+            driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", video_btn)
             video_btn.click()
             print("    🔽 Clicked 'Video Actions' button.")
             
-            video_link_elem = WebDriverWait(driver, 30).until(
-                EC.presence_of_element_located((By.XPATH, '//a[contains(@href, ".mp4") and contains(@class, "sage-dropdown__item-control--icon-download")]'))
-            )
+            video_link_elem = WebDriverWait(driver, 30).until(EC.presence_of_element_located(SEL_VIDEO_LINK))
             video_url = video_link_elem.get_attribute("href")
 
-            download_dir = os.path.dirname(video_path)
-            driver.execute("send_command", {
-                'cmd': 'Page.setDownloadBehavior',
-                'params': {'behavior': 'allow', 'downloadPath': download_dir}
-            })
-
-            driver.execute_script(f"window.open('{video_url}', '_blank');")
-            time.sleep(2)
-            driver.switch_to.window(driver.window_handles[-1])
-
-            max_wait = 120
-            waited = 0
-            while not os.path.exists(video_path) and waited < max_wait:
-                time.sleep(1)
-                waited += 1
-                partial_files = [f for f in os.listdir(download_dir) if f.endswith('.crdownload') or f.startswith(os.path.splitext(video_filename)[0])]
-                if partial_files:
-                    print(f"    ℹ️ Download in progress: {partial_files[0]}")
-
-            if os.path.exists(video_path) and os.path.getsize(video_path) > 0:
+            # Fetch the .mp4 over the pooled HTTP session instead of a browser tab;
+            # process_lesson records the failure once all of its attempts are used up
+            if download_file_safe(video_url, video_path, video_filename, record_failure=False):
                 print(f"    ✅ Downloaded video: {video_filename}")
                 status = get_lesson_status(course_title, module_title, lesson_title)
                 new_status = {"Description": status[0], "Thumbnail": status[1], "Video": "Success", "Material": status[3]}
                 log_status(course_title, module_title, lesson_title, new_status)
-                driver.close()
-                driver.switch_to.window(driver.window_handles[0])
                 return True
             else:
-                print(f"    ❌ Download failed: File not found or empty at {video_path}")
-                driver.close()
-                driver.switch_to.window(driver.window_handles[0])
+                print(f"    ❌ Download failed: {video_path}")
                 raise Exception("Download incomplete")
         except TimeoutException as e:
             print(f"    ❌ Timeout error on attempt {attempt + 1}/{MAX_RETRIES}: {e}")
@@ -222,9 +339,6 @@ def selenium_download_video(driver, lesson_url, video_path, video_filename, cour
             print(f"    ❌ Error downloading video {video_filename}: {e}")
             with open("debug_log.txt", "a") as f:
                 traceback.print_exc(file=f)
-            if len(driver.window_handles) > 1:
-                driver.close()
-                driver.switch_to.window(driver.window_handles[0])
             if attempt < MAX_RETRIES - 1:
                 time.sleep(5)
                 driver.refresh()
@@ -233,11 +347,20 @@ def selenium_download_video(driver, lesson_url, video_path, video_filename, cour
 def login_to_kajabi():
     global DRIVER
     options = Options()
-    options.add_argument('--start-maximized')
+    if HEADLESS:
+        options.add_argument('--headless=new')
+        options.add_argument('--window-size=1920,1080')
+    else:
+        options.add_argument('--start-maximized')
     options.add_argument('--force-device-scale-factor=0.5')
+    # Pages are only scraped, never looked at: skip image decoding and GPU work
+    options.add_argument('--blink-settings=imagesEnabled=false')
+    options.add_argument('--disable-gpu')
+    options.add_argument('--disable-extensions')
+    options.add_argument('--disable-dev-shm-usage')
     options.add_experimental_option("prefs", {
         "profile.default_content_setting_values.notifications": 2,
-        "profile.managed_default_content_settings.images": 1,
+        "profile.managed_default_content_settings.images": 2,
         "download.default_directory": BASE_DIR,
         "download.prompt_for_download": False,
         "download.directory_upgrade": True,
@@ -249,17 +372,18 @@ def login_to_kajabi():
     DRIVER.get(f"{KAJABI_URL}/login")
 
     try:
-        WebDriverWait(DRIVER, 30).until(EC.presence_of_element_located((By.ID, "username"))).send_keys(EMAIL)
-        DRIVER.find_element(By.ID, "password").send_keys(PASSWORD)
-        DRIVER.find_element(By.XPATH, "//button[@type='submit']").click()
-        time.sleep(5)
-        if "dashboard" in DRIVER.current_url or "admin" in DRIVER.current_url:
-            print("✅ Logged into Kajabi successfully!")
-            return DRIVER
-        else:
+        WebDriverWait(DRIVER, 30).until(EC.presence_of_element_located(SEL_USERNAME)).send_keys(EMAIL)
+        DRIVER.find_element(*SEL_PASSWORD).send_keys(PASSWORD)
+        DRIVER.find_element(*SEL_SUBMIT).click()
+        try:
+            WebDriverWait(DRIVER, 30).until(EC.any_of(EC.url_contains("dashboard"), EC.url_contains("admin")))
+        except TimeoutException:
             print("❌ Login failed. Check credentials or 2FA.")
             DRIVER.quit()
             return None
+        print("✅ Logged into Kajabi successfully!")
+        sync_session_cookies(DRIVER)
+        return DRIVER
     except Exception as e:
         print(f"❌ Login error: {e}")
         DRIVER.quit()
@@ -268,14 +392,15 @@ def login_to_kajabi():
 def get_all_courses(driver):
     print("🔍 Navigating to courses page...")
     driver.get("https://app.kajabi.com/admin/sites/100181/courses")
-    time.sleep(5)
-
-    course_cards = driver.find_elements(By.CSS_SELECTOR, "li.sage-catalog-item")
+    try:
+        course_cards = WebDriverWait(driver, 30).until(EC.presence_of_all_elements_located(SEL_COURSE_CARD))
+    except TimeoutException:
+        course_cards = []
     courses = []
     for card in course_cards:
         try:
-            title_elem = card.find_element(By.CSS_SELECTOR, "span.t-sage--truncate")
-            link_elem = card.find_element(By.CSS_SELECTOR, "a.sage-link")
+            title_elem = card.find_element(*SEL_COURSE_TITLE)
+            link_elem = card.find_element(*SEL_COURSE_LINK)
             title = title_elem.text.strip()
             url = link_elem.get_attribute("href")
 
@@ -285,7 +410,7 @@ def get_all_courses(driver):
                 "url": "https://app.kajabi.com" + url if url.startswith("/") else url
             })
 
-            safe_title = "".join(c if c.isalnum() or c in " _-–" else "_" for c in title)[:200]
+            safe_title = sanitize(title)
             course_path = os.path.join(BASE_DIR, safe_title)
             os.makedirs(course_path, exist_ok=True)
 
@@ -296,197 +421,213 @@ def get_all_courses(driver):
 
     return courses
 
-def download_file_safe(url, local_path, label=None):
+def download_file_safe(url, local_path, label=None, record_failure=True):
+    # DOWNLOAD_ADAPTER retries connecting and retryable statuses until the response headers
+    # arrive; once it gives up, so do we. Only drops while streaming the body are retried here.
+    # Data goes to a .part file that only takes the final name once complete.
+    part_path = local_path + ".part"
     for attempt in range(MAX_RETRIES):
         try:
-            headers = {'User-Agent': 'Mozilla/5.0'}
-            with requests.get(url, stream=True, headers=headers, timeout=TIMEOUT) as r:
+            r = SESSION.get(url, stream=True, timeout=TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            print(f"    ❌ Download error {label}: {e}")
+            error = str(e)
+            break
+        try:
+            with r:
                 r.raise_for_status()
                 total_length = int(r.headers.get('content-length', 0))
-                progress = tqdm(total=total_length, unit='B', unit_scale=True, desc=os.path.basename(local_path), leave=False)
-                with open(local_path, 'wb') as f:
-                    for chunk in r.iter_content(chunk_size=8192):
+                written = 0
+                with tqdm(total=total_length, unit='B', unit_scale=True, desc=os.path.basename(local_path), leave=False) as progress, \
+                        open(part_path, 'wb', buffering=DOWNLOAD_BUFFER_SIZE) as f:
+                    for chunk in r.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
                         if chunk:
                             f.write(chunk)
+                            written += len(chunk)
                             progress.update(len(chunk))
-                progress.close()
-                print(f"    ✅ Downloaded: {os.path.basename(local_path)}")
-                return True
-        except requests.exceptions.Timeout:
-            print(f"    ❌ Timeout downloading {label}. Attempt {attempt + 1}/{MAX_RETRIES}")
-            time.sleep(3)
+                # Byte count from the stream replaces re-checking the file on disk;
+                # without a Content-Length there's nothing to compare against, and empty files are valid
+                if total_length and written < total_length:
+                    raise requests.exceptions.ChunkedEncodingError(f"Incomplete download: {written}/{total_length} bytes")
+            os.replace(part_path, local_path)
+            print(f"    ✅ Downloaded: {os.path.basename(local_path)}")
+            return True
+        except requests.exceptions.HTTPError as e:
+            print(f"    ❌ Download error {label}: {e}")
+            error = str(e)
+            break
+        except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError) as e:
+            # Connection dropped or read timed out mid-body (iter_content reports both this way)
+            print(f"    ❌ Download interrupted {label}. Attempt {attempt + 1}/{MAX_RETRIES}: {e}")
+            error = str(e)
         except Exception as e:
-            print(f"    ❌ Download error {label}: {e}. Attempt {attempt + 1}/{MAX_RETRIES}")
+            print(f"    ❌ Download error {label}: {e}")
             with open("debug_log.txt", "a") as f:
                 traceback.print_exc(file=f)
-            time.sleep(3)
-    FAILED_DOWNLOADS.append({"file": label, "url": url, "error": "Max retries exceeded"})
+            error = str(e)
+            break
+        finally:
+            remove_if_exists(part_path)
+        if attempt < MAX_RETRIES - 1:
+            time.sleep(2 ** attempt)
+    if record_failure:
+        FAILED_DOWNLOADS.append({"file": label, "url": url, "error": error})
     return False
 
-def process_lesson(driver, lesson_url, lesson_title, lesson_path, lesson_counter, safe_lesson_base, course_title, module_title):
+def scrape_lesson_page(driver):
+    # One execute_script round-trip for everything process_lesson needs from the page
+    try:
+        return WebDriverWait(driver, 10).until(lambda d: d.execute_script(LESSON_PAGE_SCRIPT, LESSON_PAGE_SELECTORS, False))
+    except TimeoutException:
+        return driver.execute_script(LESSON_PAGE_SCRIPT, LESSON_PAGE_SELECTORS, True)
+
+def prefetch_lesson_page(driver, lesson_url):
+    global PREFETCHED_TAB
+    known_handles = set(driver.window_handles)
+    driver.execute_script("window.open(arguments[0], '_blank');", lesson_url)
+    new_handles = [h for h in driver.window_handles if h not in known_handles]
+    if new_handles:
+        PREFETCHED_TAB = (lesson_url, new_handles[0])
+
+def open_lesson_page(driver, lesson_url):
+    global PREFETCHED_TAB
+    prefetched, PREFETCHED_TAB = PREFETCHED_TAB, None
+    if prefetched and prefetched[1] in driver.window_handles:
+        prefetched_url, handle = prefetched
+        if prefetched_url == lesson_url:
+            driver.close()
+            driver.switch_to.window(handle)
+            print("    ⚡ Using prefetched lesson page.")
+            return
+        current = driver.current_window_handle
+        driver.switch_to.window(handle)
+        driver.close()
+        driver.switch_to.window(current)
+    driver.get(lesson_url)
+
+def process_lesson(driver, lesson_url, lesson_title, lesson_path, lesson_counter, safe_lesson_base, course_title, module_title, lesson_status, next_lesson_url=None):
     while PAUSED:
         time.sleep(1)
     if INTERRUPTED:
         return
 
-    desc_status, thumb_status, video_status, mat_status = get_lesson_status(course_title, module_title, safe_lesson_base)
+    # Completed lessons never get here; get_modules_and_lessons filters them out
+    desc_status, thumb_status, video_status, mat_status = lesson_status
     print(f"    🔍 Checking lesson: {lesson_title} - Status: Desc={desc_status}, Thumb={thumb_status}, Video={video_status}, Mat={mat_status}")
 
     status = {"Description": desc_status, "Thumbnail": thumb_status, "Video": video_status, "Material": mat_status}
-    threads = []
+    pending = []
+    claimed_paths = set()
 
     force_video_redownload = video_status in ["Queued", "Failed"]
 
-    if not force_video_redownload and all(s in ["Success", "None"] for s in [desc_status, thumb_status, video_status, mat_status]):
-        print(f"    ⏭️ All components already downloaded successfully. Skipping lesson: {safe_lesson_base}")
-        return
-
     print(f"    🔍 Opening lesson page: {lesson_title}")
-    driver.get(lesson_url)
-    WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
+    open_lesson_page(driver, lesson_url)
+    WebDriverWait(driver, 30).until(EC.presence_of_element_located(SEL_BODY))
+
+    for attempt in range(MAX_RETRIES):
+        data = scrape_lesson_page(driver)
+        missing = []
+        if desc_status == "Failed" and not data["description"]:
+            missing.append("description")
+        if thumb_status == "Failed" and not data["thumbnail"]:
+            missing.append("thumbnail")
+        if not missing:
+            break
+        print(f"    ⚠️ Lesson page missing {', '.join(missing)}. Attempt {attempt + 1}/{MAX_RETRIES}")
+        if attempt < MAX_RETRIES - 1:
+            print("    🔄 Refreshing page...")
+            driver.refresh()
+            WebDriverWait(driver, 30).until(EC.presence_of_element_located(SEL_BODY))
+
+    # Let the next lesson load in a background tab while this one downloads
+    if next_lesson_url:
+        prefetch_lesson_page(driver, next_lesson_url)
 
     # Description
     if desc_status == "Failed":
-        for attempt in range(MAX_RETRIES):
-            try:
-                description_elem = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'div.kjb-rte')))
-                description_text = description_elem.text.strip()
-                if description_text:
-                    with open(os.path.join(lesson_path, "description.txt"), "w", encoding="utf-8") as f:
-                        f.write(description_text)
-                    print("    📝 Description saved.")
-                    status["Description"] = "Success"
-                    break
-            except:
-                try:
-                    iframe = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'iframe')))
-                    driver.switch_to.frame(iframe)
-                    body_elem = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'body#tinymce')))
-                    description_text = body_elem.text.strip()
-                    driver.switch_to.default_content()
-                    if description_text:
-                        with open(os.path.join(lesson_path, "description.txt"), "w", encoding="utf-8") as f:
-                            f.write(description_text)
-                        print("    📝 Description saved from iframe.")
-                        status["Description"] = "Success"
-                        break
-                except Exception as e:
-                    print(f"    ⚠️ Description not found. Attempt {attempt + 1}/{MAX_RETRIES}: {e}")
-                    if attempt < MAX_RETRIES - 1:
-                        print("    🔄 Refreshing page...")
-                        driver.refresh()
-                        WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                    time.sleep(3)
+        if data["description"]:
+            with open(os.path.join(lesson_path, "description.txt"), "w", encoding="utf-8") as f:
+                f.write(data["description"])
+            print("    📝 Description saved.")
+            status["Description"] = "Success"
+        else:
+            print("    ⚠️ Description not found.")
 
     # Thumbnail
     if thumb_status == "Failed":
-        for attempt in range(MAX_RETRIES):
-            try:
-                thumb_elem = WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.CSS_SELECTOR, 'img.img-thumbnail')))
-                thumb_url = thumb_elem.get_attribute("src")
-                thumb_filename = f"{safe_lesson_base}.jpg"
-                thumb_path = get_unique_filename(lesson_path, thumb_filename)
-                t = threading.Thread(target=download_file_safe, args=(thumb_url, thumb_path, thumb_filename))
-                threads.append(t)
-                t.start()
-                print("    🖼️ Thumbnail queued for download.")
-                status["Thumbnail"] = "Success"
-                break
-            except Exception as e:
-                print(f"    ⚠️ Thumbnail not found. Attempt {attempt + 1}/{MAX_RETRIES}: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    print("    🔄 Refreshing page...")
-                    driver.refresh()
-                    WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                time.sleep(3)
-
-    # Video
-    if force_video_redownload or video_status == "Failed":
-        for attempt in range(MAX_RETRIES):
-            try:
-                none_btn = driver.find_element(By.XPATH, '//button[.//em[text()="None"] and contains(@class, "sage-choice--active")]')
-                print("    ⛔ Video skipped (None selected).")
-                status["Video"] = "None"
-                break
-            except NoSuchElementException:
-                video_filename = f"{safe_lesson_base}.mp4"
-                video_path = get_unique_filename(lesson_path, video_filename)
-                if not os.path.exists(video_path) or os.path.getsize(video_path) == 0:
-                    if selenium_download_video(driver, lesson_url, video_path, video_filename, course_title, module_title, safe_lesson_base):
-                        status["Video"] = "Success"
-                        break
-                    else:
-                        print(f"    ❌ Video download failed after Selenium attempt {attempt + 1}/{MAX_RETRIES}")
-                        if attempt < MAX_RETRIES - 1:
-                            time.sleep(5)
-                            driver.refresh()
-                            WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                else:
-                    print(f"    ⚠️ Video already exists and valid: {video_filename}")
-                    status["Video"] = "Success"
-                    break
-            except Exception as e:
-                print(f"    ⚠️ Video processing error. Attempt {attempt + 1}/{MAX_RETRIES}: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    print("    🔄 Refreshing page...")
-                    driver.refresh()
-                    WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                time.sleep(3)
+        if data["thumbnail"]:
+            thumb_filename = f"{safe_lesson_base}.jpg"
+            thumb_path = get_unique_filename(lesson_path, thumb_filename, claimed_paths)
+            claimed_paths.add(thumb_path)
+            pending.append(("Thumbnail", data["thumbnail"], thumb_path, thumb_filename))
+            print("    🖼️ Thumbnail queued for download.")
+            status["Thumbnail"] = "Success"
         else:
-            print("    📹 No video available or all attempts failed.")
-            status["Video"] = "Failed"
-            FAILED_DOWNLOADS.append({"file": video_filename, "url": lesson_url, "error": "Max retries exceeded"})
+            print("    ⚠️ Thumbnail not found.")
 
     # Material
     if mat_status == "Failed":
-        for attempt in range(MAX_RETRIES):
-            try:
-                resource_sections = driver.find_elements(By.CSS_SELECTOR, 'section.sage-sortable__item--card')
-                if not resource_sections:
-                    print("    📎 No material sections found.")
-                    status["Material"] = "None"
-                    break
-                else:
-                    material_found = False
-                    for section in resource_sections:
-                        try:
-                            title_elem = section.find_element(By.CSS_SELECTOR, 'h1.sage-sortable__item-title')
-                            resource_name = title_elem.text.strip()
-                            download_link = section.find_element(By.CSS_SELECTOR, 'a.sage-btn--icon-only-download')
-                            file_url = download_link.get_attribute("href")
-                            file_ext = os.path.splitext(file_url.split("?")[0])[1]
-                            safe_filename = "".join(c if c.isalnum() or c in " ._-–" else "_" for c in resource_name)[:200] + file_ext
-                            file_path = get_unique_filename(lesson_path, safe_filename)
-                            if not os.path.exists(file_path) or os.path.getsize(file_path) == 0:
-                                print(f"    📎 Downloading material: {safe_filename}")
-                                t = threading.Thread(target=download_file_safe, args=(file_url, file_path, safe_filename))
-                                threads.append(t)
-                                t.start()
-                                material_found = True
-                            else:
-                                print(f"    ⚠️ Material already exists: {safe_filename}")
-                                material_found = True
-                        except Exception as e:
-                            print(f"    ⚠️ Error processing material resource: {e}")
-                    if material_found:
-                        status["Material"] = "Success"
-                        break
+        if not data["materials"]:
+            print("    📎 No material sections found.")
+            status["Material"] = "None"
+        else:
+            material_found = False
+            for material in data["materials"]:
+                try:
+                    resource_name = material["name"]
+                    file_url = material["url"]
+                    if not file_url:
+                        raise Exception(f"No download link for '{resource_name}'")
+                    file_ext = os.path.splitext(file_url.split("?")[0])[1]
+                    safe_filename = sanitize(resource_name, table=SAFE_FILE_TABLE) + file_ext
+                    # Downloads finish under their final name, so a non-empty file there is complete
+                    target_path = os.path.join(lesson_path, safe_filename)
+                    target_stat = None if target_path in claimed_paths else stat_or_none(target_path)
+                    if target_stat and target_stat.st_size > 0:
+                        print(f"    ⚠️ Material already exists: {safe_filename}")
+                        claimed_paths.add(target_path)
+                        material_found = True
                     else:
-                        status["Material"] = "None"
-                        break
+                        file_path = get_unique_filename(lesson_path, safe_filename, claimed_paths)
+                        print(f"    📎 Downloading material: {safe_filename}")
+                        claimed_paths.add(file_path)
+                        pending.append(("Material", file_url, file_path, safe_filename))
+                        material_found = True
+                except Exception as e:
+                    print(f"    ⚠️ Error processing material resource: {e}")
+            status["Material"] = "Success" if material_found else "None"
+
+    # Submit grouped by host so consecutive requests reuse warm pooled connections,
+    # and before the video so these downloads overlap with it
+    pending.sort(key=lambda item: urlparse(item[1]).netloc)
+    futures = [(field, DOWNLOAD_POOL.submit(download_file_safe, url, path, name)) for field, url, path, name in pending]
+
+    # Video
+    if force_video_redownload or video_status == "Failed":
+        video_filename = f"{safe_lesson_base}.mp4"
+        if data["videoNone"]:
+            print("    ⛔ Video skipped (None selected).")
+            status["Video"] = "None"
+        else:
+            # selenium_download_video makes its own MAX_RETRIES attempts, reloading the page each time
+            video_path = get_unique_filename(lesson_path, video_filename, claimed_paths)
+            try:
+                video_ok = selenium_download_video(driver, lesson_url, video_path, video_filename, course_title, module_title, safe_lesson_base)
             except Exception as e:
-                print(f"    ⚠️ Material section check failed. Attempt {attempt + 1}/{MAX_RETRIES}: {e}")
-                if attempt < MAX_RETRIES - 1:
-                    print("    🔄 Refreshing page...")
-                    driver.refresh()
-                    WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-                time.sleep(3)
+                print(f"    ⚠️ Video processing error: {e}")
+                video_ok = False
+            if video_ok:
+                status["Video"] = "Success"
             else:
-                print("    📎 No materials available after retries.")
-                status["Material"] = "None"
-
-    for t in threads:
-        t.join()
+                print("    📹 No video available or all attempts failed.")
+                status["Video"] = "Failed"
+                FAILED_DOWNLOADS.append({"file": video_filename, "url": lesson_url, "error": "Max retries exceeded"})
+
+    # A failed thumbnail or material marks its field Failed so the next run retries it
+    for field, future in futures:
+        if not future.result():
+            status[field] = "Failed"
     log_status(course_title, module_title, safe_lesson_base, status)
 
 def get_modules_and_lessons(driver, course_url, course_folder, course_title):
@@ -494,14 +635,16 @@ def get_modules_and_lessons(driver, course_url, course_folder, course_title):
     for attempt in range(MAX_RETRIES):
         try:
             driver.get(course_url)
-            WebDriverWait(driver, 30).until(EC.presence_of_element_located((By.TAG_NAME, "body")))
-            time.sleep(4)
+            WebDriverWait(driver, 30).until(EC.presence_of_element_located(SEL_BODY))
 
             try:
-                expand_btn = WebDriverWait(driver, 10).until(EC.element_to_be_clickable((By.XPATH, '//button[.//span[contains(text(), "Expand All")]]')))
+                expand_btn = WebDriverWait(driver, 10).until(EC.element_to_be_clickable(SEL_EXPAND_ALL))
                 expand_btn.click()
                 print("    🔼 Clicked 'Expand All' button.")
-                time.sleep(2)
+                try:
+                    WebDriverWait(driver, 10).until(EC.presence_of_all_elements_located(SEL_OUTLINE_LESSON))
+                except TimeoutException:
+                    print("    ℹ️ No lessons appeared after expanding.")
             except:
                 print("    ℹ️ 'Expand All' button not found.")
 
@@ -513,16 +656,14 @@ def get_modules_and_lessons(driver, course_url, course_folder, course_title):
 
             completed_lessons = get_completed_lessons()
 
-            outline_items = WebDriverWait(driver, 30).until(
-                EC.presence_of_all_elements_located((By.CSS_SELECTOR, 'section.kjb-outlinelist-item'))
-            )
+            outline_items = WebDriverWait(driver, 30).until(EC.presence_of_all_elements_located(SEL_OUTLINE_ITEM))
             for index, item in enumerate(outline_items):
                 class_name = item.get_attribute("class")
 
                 if "kjb-outlinelist-item--category" in class_name:
-                    current_module_title = item.find_element(By.CSS_SELECTOR, 'span.sage-btn__truncate-text').text.strip()
+                    current_module_title = item.find_element(*SEL_OUTLINE_TITLE).text.strip()
                     module_folder_name = f"{module_counter:02d} - {current_module_title}"
-                    safe_module = "".join(c if c.isalnum() or c in " _-–" else "_" for c in module_folder_name)[:200]
+                    safe_module = sanitize(module_folder_name)
                     module_path = os.path.join(course_folder, safe_module)
                     os.makedirs(module_path, exist_ok=True)
                     print(f"\n📂 Module: {module_folder_name}")
@@ -530,14 +671,11 @@ def get_modules_and_lessons(driver, course_url, course_folder, course_title):
                     lesson_counter = 1
 
                 elif "kjb-outlinelist-item--depth-1" in class_name and module_path:
-                    lesson_title = item.find_element(By.CSS_SELECTOR, 'span.sage-btn__truncate-text').text.strip()
-                    lesson_link = item.find_element(By.CSS_SELECTOR, 'a[href*="/admin/posts/"]').get_attribute("href")
+                    lesson_title = item.find_element(*SEL_OUTLINE_TITLE).text.strip()
+                    lesson_link = item.find_element(*SEL_LESSON_LINK).get_attribute("href")
                     safe_lesson_base = f"{lesson_counter:02d} - {lesson_title}"
-                    safe_lesson_base = "".join(c if c.isalnum() or c in " _-–" else "_" for c in safe_lesson_base)[:200]
-                    lesson_key = f"{course_title}|{current_module_title}|{safe_lesson_base}"
-
-                    desc_status, thumb_status, video_status, mat_status = get_lesson_status(course_title, current_module_title, safe_lesson_base)
-                    if lesson_key in completed_lessons and all(s in ["Success", "None"] for s in [desc_status, thumb_status, video_status, mat_status]):
+                    safe_lesson_base = sanitize(safe_lesson_base)
+                    if (course_title, current_module_title, safe_lesson_base) in completed_lessons:
                         print(f"    ⏭️ Already downloaded. Skipping lesson: {safe_lesson_base}")
                         lesson_counter += 1
                         continue
@@ -545,12 +683,11 @@ def get_modules_and_lessons(driver, course_url, course_folder, course_title):
                     print(f"  🎓 Lesson: {safe_lesson_base}")
                     lesson_path = os.path.join(module_path, safe_lesson_base)
                     os.makedirs(lesson_path, exist_ok=True)
-                    lessons.append((lesson_link, lesson_title, lesson_path, lesson_counter, safe_lesson_base, current_module_title))
+                    lesson_status = get_lesson_status(course_title, current_module_title, safe_lesson_base)
+                    lessons.append((lesson_link, lesson_title, lesson_path, lesson_counter, safe_lesson_base, course_title, current_module_title, lesson_status))
                     lesson_counter += 1
 
-            with ThreadPoolExecutor(max_workers=MAX_LESSON_THREADS) as executor:
-                executor.map(lambda args: process_lesson(driver, args[0], args[1], args[2], args[3], args[4], course_title, args[5]), lessons)
-            return
+            return lessons
 
         except TimeoutException as e:
             print(f"    ❌ Timeout error on attempt {attempt + 1}/{MAX_RETRIES}: {e}")
@@ -568,26 +705,79 @@ def get_modules_and_lessons(driver, course_url, course_folder, course_title):
                 driver.refresh()
     print(f"    ❌ Failed to scrape course after {MAX_RETRIES} attempts.")
     FAILED_DOWNLOADS.append({"file": course_title, "url": course_url, "error": "Failed to scrape modules"})
+    return []
+
+def iter_lesson_batches(driver, courses):
+    for course in courses:
+        course_title = course["title"]
+        course_url = course["url"]
+        safe_course = sanitize(course_title)
+        course_folder = os.path.join(BASE_DIR, safe_course)
+        os.makedirs(course_folder, exist_ok=True)
+
+        print(f"\n🚀 Processing course: {course_title}")
+        lessons = get_modules_and_lessons(driver, course_url, course_folder, course_title)
+        # Consecutive lessons go to one worker so it can prefetch the next page
+        for start in range(0, len(lessons), LESSON_BATCH_SIZE):
+            yield lessons[start:start + LESSON_BATCH_SIZE]
+
+def init_worker():
+    global IS_WORKER, WORKER_DRIVER
+    IS_WORKER = True
+    load_log_index()
+    WORKER_DRIVER = login_to_kajabi()
+    if WORKER_DRIVER:
+        # Pool workers exit via os._exit, so atexit hooks never run; Finalize does
+        Finalize(None, WORKER_DRIVER.quit, exitpriority=10)
+
+def run_lesson_batch(batch):
+    if WORKER_DRIVER is not None:
+        # Pick up any cookies Kajabi rotated since the last batch
+        sync_session_cookies(WORKER_DRIVER)
+    for index, task in enumerate(batch):
+        lesson_url, safe_lesson_base = task[0], task[4]
+        next_lesson_url = batch[index + 1][0] if index + 1 < len(batch) else None
+        if WORKER_DRIVER is None:
+            FAILED_DOWNLOADS.append({"file": safe_lesson_base, "url": lesson_url, "error": "Worker failed to log in"})
+            continue
+        try:
+            process_lesson(WORKER_DRIVER, *task, next_lesson_url=next_lesson_url)
+        except Exception as e:
+            print(f"    ❌ Error processing lesson {safe_lesson_base}: {e}")
+            with open("debug_log.txt", "a") as f:
+                traceback.print_exc(file=f)
+            FAILED_DOWNLOADS.append({"file": safe_lesson_base, "url": lesson_url, "error": str(e)})
+
+    rows, failures = WORKER_LOG_ROWS[:], FAILED_DOWNLOADS[:]
+    del WORKER_LOG_ROWS[:]
+    del FAILED_DOWNLOADS[:]
+    return rows, failures
 
 if __name__ == "__main__":
     start_time = time.time()
 
+    load_log_index()
     driver = login_to_kajabi()
     if driver:
-        courses = get_all_courses(driver)
-        print(f"\n📘 Found {len(courses)} courses.")
-
-        for course in courses:
-            course_title = course["title"]
-            course_url = course["url"]
-            safe_course = "".join(c if c.isalnum() or c in " _-–" else "_" for c in course_title)[:200]
-            course_folder = os.path.join(BASE_DIR, safe_course)
-            os.makedirs(course_folder, exist_ok=True)
-
-            print(f"\n🚀 Processing course: {course_title}")
-            get_modules_and_lessons(driver, course_url, course_folder, course_title)
+        try:
+            courses = get_all_courses(driver)
+            print(f"\n📘 Found {len(courses)} courses.")
 
-        driver.quit()
+            # This driver scrapes course outlines while each pool worker logs in with
+            # its own Chrome instance and downloads lesson batches as they are produced.
+            pool = multiprocessing.Pool(processes=MAX_DRIVERS, initializer=init_worker)
+            try:
+                for rows, failures in pool.imap_unordered(run_lesson_batch, iter_lesson_batches(driver, courses)):
+                    for row in rows:
+                        record_log_row(row)
+                    FAILED_DOWNLOADS.extend(failures)
+            finally:
+                pool.close()
+                pool.join()
+        finally:
+            DOWNLOAD_POOL.shutdown(wait=True)
+            compact_log()
+            driver.quit()
 
     end_time = time.time()
     print(f"\n⏱️ Total time: {round(end_time - start_time, 2)} seconds")
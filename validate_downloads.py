@@ -1,123 +1,245 @@
 import os
+import re
 import csv
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 
 # Configuration
 LOG_FILE = "download_log.csv"
 BASE_DIR = os.getenv('KAJABI_DOWNLOAD_DIR', os.path.join(os.path.expanduser('~'), 'Kajabi_Courses'))
 OUTPUT_FILE = "validation_results.csv"
+DISCREPANCY_FILE = "discrepancies.log"
+# Validation is mostly directory syscalls, so oversubscribe the CPUs to overlap them
+VALIDATION_THREADS = min(32, (os.cpu_count() or 4) * 8)
+MAX_IN_FLIGHT = VALIDATION_THREADS * 4  # Entries queued ahead of the one being written
+IO_BUFFER_SIZE = 1 << 20  # 1 MiB buffers for the log and results files
+LOG_HEADERS = ["Timestamp", "Course", "Module", "Lesson", "Description", "Thumbnail", "Video", "Material"]
+
+LogEntry = namedtuple("LogEntry", LOG_HEADERS)
 
 # Supported file extensions
 DESCRIPTION_EXT = ".txt"
-VIDEO_EXTS = {".mp4", ".mov", ".avi", ".mkv", ".webm", ".mp3", ".wav", ".m4v", ".m4a", ".m4b", ".m4p", ".m4v", ".m4a", ".m4b", ".m4p"}
-MATERIAL_EXTS = {".pdf", ".mp3", ".docx", ".zip", ".wav", ".jpg", ".png", ".jpeg", ".gif", ".svg", ".webp"}
-THUMBNAIL_EXT = {".jpg", ".png", ".jpeg", ".gif", ".svg", ".webp"}
+VIDEO_EXTS = frozenset({".mp4", ".mov", ".avi", ".mkv", ".webm", ".mp3", ".wav", ".m4v", ".m4a", ".m4b", ".m4p"})
+MATERIAL_EXTS = frozenset({".pdf", ".mp3", ".docx", ".zip", ".wav", ".jpg", ".png", ".jpeg", ".gif", ".svg", ".webp"})
+THUMBNAIL_EXT = frozenset({".jpg", ".png", ".jpeg", ".gif", ".svg", ".webp"})
+
+# Numeric prefix kajabi.py puts on module folders, e.g. "03 - "
+PREFIX_RE = re.compile(r'^\d+\s*-\s*')
+
+# Extension -> category; audio in both sets counts as video, images are thumbnails when named after the lesson
+EXT_CLASS = {e: "material" for e in MATERIAL_EXTS}
+EXT_CLASS.update({e: "video" for e in VIDEO_EXTS})
+EXT_CLASS.update({e: "thumbnail" for e in THUMBNAIL_EXT})
+
+class NormalizeTable(dict):
+    """Translation table for normalize_name; each code point's mapping is computed on first lookup."""
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        mapped = char if char.isalnum() or char in " _-–" else "_"
+        self[codepoint] = mapped
+        return mapped
 
+NORMALIZE_TABLE = NormalizeTable()
+
+@lru_cache(maxsize=8192)
 def normalize_name(name):
     """Normalize a name by replacing parentheses with underscores to match download script sanitization."""
-    return "".join(c if c.isalnum() or c in " _-–" else "_" for c in name).strip()
-
-def find_module_dir(base_path, module_name):
-    """Find a module directory, ignoring numeric prefix and matching sanitized names."""
-    if not os.path.exists(base_path):
-        return None
-    normalized_module = normalize_name(module_name)
-    for dir_name in os.listdir(base_path):
-        if os.path.isdir(os.path.join(base_path, dir_name)):
-            clean_dir_name = dir_name.split(" - ", 1)[-1] if " - " in dir_name else dir_name
-            normalized_dir = normalize_name(clean_dir_name)
-            if normalized_dir == normalized_module:
-                return dir_name
-            if dir_name == module_name:
-                return dir_name
-    return None
-
-def validate_log_entry(entry, base_dir):
+    return name.translate(NORMALIZE_TABLE).strip()
+
+def index_module_dirs(course_path):
+    """Return (normalized name -> path, directory name -> path) for the module directories of a course."""
+    by_normalized = {}
+    by_name = {}
+    with os.scandir(course_path) as it:
+        for de in it:
+            if not de.is_dir():
+                continue
+            dir_name = de.name
+            clean_dir_name = PREFIX_RE.sub("", dir_name, count=1)
+            by_normalized.setdefault(normalize_name(clean_dir_name), de.path)
+            by_name[dir_name] = de.path
+    return by_normalized, by_name
+
+def build_course_index(base_dir):
+    """Scan base_dir once, indexing the module directories of every course directory by course name."""
+    course_index = {}
+    with os.scandir(base_dir) as it:
+        for de in it:
+            if de.is_dir():
+                course_index[de.name] = index_module_dirs(de.path)
+    return course_index
+
+def find_module_dir(module_index, module_name):
+    """Find a module directory's path, ignoring numeric prefix and matching sanitized names."""
+    by_normalized, by_name = module_index
+    module_path = by_normalized.get(normalize_name(module_name))
+    if module_path is None:
+        module_path = by_name.get(module_name)
+    return module_path
+
+dir_cache_lock = threading.Lock()
+
+def list_files(path, dir_cache):
+    """List the files in path, or None if it doesn't exist, reusing results cached in dir_cache."""
+    with dir_cache_lock:
+        if path in dir_cache:
+            return dir_cache[path]
+    try:
+        with os.scandir(path) as it:
+            files = [de.name for de in it if de.is_file()]
+    except FileNotFoundError:
+        files = None
+    with dir_cache_lock:
+        return dir_cache.setdefault(path, files)
+
+def read_log_entries(f):
+    """Return an iterator of LogEntry tuples for the rows of a download log, locating columns by the header row.
+    
+    The header is read immediately, so a log missing a column raises ValueError before any entry is processed.
+    """
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if not header:
+        return iter(())
+    missing = [name for name in LOG_HEADERS if name not in header]
+    if missing:
+        raise ValueError(f"Download log is missing column(s): {', '.join(missing)}")
+    columns = [header.index(name) for name in LOG_HEADERS]
+    width = max(columns) + 1
+    
+    def entries():
+        for row in reader:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            yield LogEntry._make([row[i] for i in columns])
+    return entries()
+
+def validate_log_entry(entry, base_dir, course_index, dir_cache):
     """Validate a single log entry against the filesystem, adjusting for flattened hierarchy."""
     discrepancies = []
     validated_status = {
-        "Timestamp": entry["Timestamp"],
-        "Course": entry["Course"],
-        "Module": entry["Module"],
-        "Lesson": entry["Lesson"],
+        "Timestamp": entry.Timestamp,
+        "Course": entry.Course,
+        "Module": entry.Module,
+        "Lesson": entry.Lesson,
         "Description": "Failed",
         "Thumbnail": "Failed",
         "Video": "Failed",
         "Material": "Failed"
     }
     
-    course = normalize_name(entry["Course"])  # Normalize course name
-    module = entry["Module"]
-    lesson = entry["Lesson"]
-    course_path = os.path.join(base_dir, course)
+    # Nothing was recorded as downloaded, so no discrepancy is possible; skip the filesystem
+    # and say so rather than reporting the files as missing
+    if "Success" not in (entry.Description, entry.Thumbnail, entry.Video, entry.Material):
+        for field in ("Description", "Thumbnail", "Video", "Material"):
+            validated_status[field] = "Unchecked"
+        return validated_status, discrepancies
+    
+    course = normalize_name(entry.Course)  # Normalize course name
+    module = entry.Module
+    lesson = entry.Lesson
+    module_index = course_index.get(course)
     
-    if not os.path.exists(course_path):
-        discrepancies.append(f"Course directory not found: {course_path}")
+    if module_index is None:
+        discrepancies.append(f"Course directory not found: {os.path.join(base_dir, course)}")
         return validated_status, discrepancies
     
     # Try finding the module directory first
-    module_dir = find_module_dir(course_path, module)
-    if module_dir:
+    module_path = find_module_dir(module_index, module)
+    if module_path:
         # Construct lesson path assuming standard hierarchy
-        lesson_path = os.path.join(course_path, module_dir, lesson)
-        if not os.path.exists(lesson_path):
-            # Fallback: Check if module_dir itself is the target directory
-            lesson_path = os.path.join(course_path, module_dir)
-            if not os.path.exists(lesson_path):
-                existing_dirs = [d for d in os.listdir(course_path) if os.path.isdir(os.path.join(course_path, d))]
-                discrepancies.append(f"Lesson directory missing: {lesson_path}. Existing dirs in course: {', '.join(existing_dirs) or 'None'}")
-                return validated_status, discrepancies
+        lesson_path = os.path.join(module_path, lesson)
+        all_files = list_files(lesson_path, dir_cache)
+        if all_files is None:
+            # Fallback: Check if the module directory itself is the target directory
+            lesson_path = module_path
+            all_files = list_files(lesson_path, dir_cache)
     else:
         # Fallback: Module might be prefixed directly in course
         prefixed_module = f"{lesson.split(' - ')[0]} - {module}"
-        module_dir = find_module_dir(course_path, prefixed_module)
-        if module_dir:
-            lesson_path = os.path.join(course_path, module_dir)
+        module_path = find_module_dir(module_index, prefixed_module)
+        if module_path:
+            lesson_path = module_path
+            all_files = list_files(lesson_path, dir_cache)
         else:
-            existing_dirs = [d for d in os.listdir(course_path) if os.path.isdir(os.path(course_path, d))]
-            discrepancies.append(f"Module directory not found for '{module}' in {course_path}. Existing dirs: {', '.join(existing_dirs) or 'None'}")
+            discrepancies.append(f"Module directory not found for '{module}' in {os.path.join(base_dir, course)}. Existing dirs: {', '.join(module_index[1]) or 'None'}")
             return validated_status, discrepancies
     
-    # Get all files in the lesson directory
-    all_files = [f for f in os.listdir(lesson_path) if os.path.isfile(os.path.join(lesson_path, f))]
+    if all_files is None:
+        discrepancies.append(f"Lesson directory missing: {lesson_path}. Existing dirs in course: {', '.join(module_index[1]) or 'None'}")
+        return validated_status, discrepancies
+    
+    # Classify the lesson files in a single pass
+    lesson_lower = lesson.lower()
+    thumbnail_found = False
+    description_files = []
+    buckets = {"video": [], "material": []}
+    for f in all_files:
+        if f.endswith(DESCRIPTION_EXT):
+            description_files.append(f)
+        f_lower = f.lower()
+        dot = f_lower.rfind(".")
+        ext = f_lower[dot:] if dot > 0 else ""
+        cls = EXT_CLASS.get(ext)
+        if cls == "thumbnail":
+            if f_lower[:dot] == lesson_lower:
+                thumbnail_found = True
+                continue
+            cls = "material"
+        if cls:
+            buckets[cls].append(f)
+    video_files = buckets["video"]
+    material_files = buckets["material"]
     
     # Validate Description
-    description_files = [f for f in all_files if f.endswith(DESCRIPTION_EXT)]
     if description_files:
         validated_status["Description"] = "Success"
-    elif entry["Description"] == "Success":
+    elif entry.Description == "Success":
         discrepancies.append(f"Description marked Success but no .txt file found in: {lesson_path}. Files: {', '.join(all_files) or 'None'}")
     
     # Validate Thumbnail
-    thumbnail_file = f"{lesson}{THUMBNAIL_EXT}"
-    thumbnail_found = any(f.lower() == thumbnail_file.lower() for f in all_files)
     if thumbnail_found:
         validated_status["Thumbnail"] = "Success"
-    elif entry["Thumbnail"] == "Success":
-        discrepancies.append(f"Thumbnail marked Success but no {thumbnail_file} found in: {lesson_path}. Files: {', '.join(all_files) or 'None'}")
+    elif entry.Thumbnail == "Success":
+        discrepancies.append(f"Thumbnail marked Success but no {lesson} image ({', '.join(THUMBNAIL_EXT)}) found in: {lesson_path}. Files: {', '.join(all_files) or 'None'}")
     
     # Validate Video
-    video_files = [f for f in all_files if os.path.splitext(f)[1].lower() in VIDEO_EXTS]
     if video_files:
         validated_status["Video"] = "Success"
-    elif entry["Video"] == "Success":
+    elif entry.Video == "Success":
         discrepancies.append(f"Video marked Success but no video files ({', '.join(VIDEO_EXTS)}) found in: {lesson_path}. Files: {', '.join(all_files) or 'None'}")
     
     # Validate Material
-    exclude_files = {thumbnail_file} | {f for f in description_files} | {f for f in video_files}
-    material_files = [f for f in all_files if os.path.splitext(f)[1].lower() in MATERIAL_EXTS and f not in exclude_files]
     if material_files:
         validated_status["Material"] = "Success"
-    elif entry["Material"] == "Success":
+    elif entry.Material == "Success":
         discrepancies.append(f"Material marked Success but no material files ({', '.join(MATERIAL_EXTS)}) found in: {lesson_path}. Files: {', '.join(all_files) or 'None'}")
     
     return validated_status, discrepancies
 
-def validate_download_log(log_file, base_dir, output_file):
-    """Validate the download log and write results to a new CSV."""
+def validate_entries(executor, entries, base_dir, course_index, dir_cache):
+    """Yield (entry, validated status, discrepancies) in log order, keeping at most MAX_IN_FLIGHT entries queued."""
+    in_flight = deque()
+    for entry in entries:
+        in_flight.append((entry, executor.submit(validate_log_entry, entry, base_dir, course_index, dir_cache)))
+        if len(in_flight) >= MAX_IN_FLIGHT:
+            entry, future = in_flight.popleft()
+            yield (entry, *future.result())
+    while in_flight:
+        entry, future = in_flight.popleft()
+        yield (entry, *future.result())
+
+def validate_download_log(log_file, base_dir, output_file, discrepancy_file=DISCREPANCY_FILE):
+    """Validate the download log, writing results to a new CSV and discrepancy details to a log file."""
     print(f"Validating download log: {log_file}")
     print(f"Against directory: {base_dir}")
     print(f"Writing results to: {output_file}")
+    print(f"Writing discrepancies to: {discrepancy_file}")
     print("-" * 50)
     
     if not os.path.exists(log_file):
@@ -128,37 +250,47 @@ def validate_download_log(log_file, base_dir, output_file):
         print(f"❌ Base directory not found: {base_dir}")
         return
     
-    headers = ["Timestamp", "Course", "Module", "Lesson", "Description", "Thumbnail", "Video", "Material"]
-    validated_entries = []
+    course_index = build_course_index(base_dir)
+    dir_cache = {}
     
-    with open(log_file, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        total_entries = 0
-        discrepancies_found = 0
-        
-        for entry in reader:
-            total_entries += 1
-            validated_status, issues = validate_log_entry(entry, base_dir)
-            validated_entries.append(validated_status)
-            
-            if issues:
-                discrepancies_found += 1
-                print(f"\nEntry: {entry['Timestamp']} - {entry['Course']} > {entry['Module']} > {entry['Lesson']}")
-                for issue in issues:
-                    print(f"  ⚠️ {issue}")
+    with open(log_file, "r", encoding="utf-8", buffering=IO_BUFFER_SIZE) as f:
+        # Check the header before the results file is opened, so a bad log doesn't truncate it
+        try:
+            entries = read_log_entries(f)
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
         
-        with open(output_file, "w", newline='', encoding="utf-8") as out_f:
-            writer = csv.DictWriter(out_f, fieldnames=headers)
+        with open(output_file, "w", newline='', encoding="utf-8", buffering=IO_BUFFER_SIZE) as out_f, \
+                ThreadPoolExecutor(max_workers=VALIDATION_THREADS) as executor:
+            writer = csv.DictWriter(out_f, fieldnames=LOG_HEADERS)
             writer.writeheader()
-            writer.writerows(validated_entries)
-        
-        print("-" * 50)
-        print(f"Validation complete!")
-        print(f"Total entries checked: {total_entries}")
-        print(f"Entries with discrepancies: {discrepancies_found}")
-        print(f"Results saved to: {output_file}")
-        if discrepancies_found == 0:
-            print("✅ All entries match the filesystem!")
+            total_entries = 0
+            discrepancies_found = 0
+            report_lines = []
+            
+            for entry, validated_status, issues in validate_entries(executor, entries, base_dir, course_index, dir_cache):
+                total_entries += 1
+                writer.writerow(validated_status)
+                
+                if issues:
+                    discrepancies_found += 1
+                    report_lines.append(f"Entry: {entry.Timestamp} - {entry.Course} > {entry.Module} > {entry.Lesson}\n")
+                    report_lines.extend(f"  ⚠️ {issue}\n" for issue in issues)
+                    report_lines.append("\n")
+    
+    with open(discrepancy_file, "w", encoding="utf-8", buffering=IO_BUFFER_SIZE) as report_f:
+        report_f.writelines(report_lines)
+    
+    print("-" * 50)
+    print(f"Validation complete!")
+    print(f"Total entries checked: {total_entries}")
+    print(f"Entries with discrepancies: {discrepancies_found}")
+    print(f"Results saved to: {output_file}")
+    if discrepancies_found:
+        print(f"⚠️ Discrepancy details saved to: {discrepancy_file}")
+    else:
+        print("✅ All entries match the filesystem!")
 
 if __name__ == "__main__":
     validate_download_log(LOG_FILE, BASE_DIR, OUTPUT_FILE)
\ No newline at end of file